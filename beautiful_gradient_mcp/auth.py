@@ -8,6 +8,7 @@ from typing import Optional, Dict, Any
 import httpx
 import jwt
 from jwt import PyJWKClient
+from starlette.concurrency import run_in_threadpool
 from logger import oauth_logger, error_logger
 
 # Stytch configuration
@@ -24,12 +25,40 @@ STYTCH_AUTHENTICATE_URL = "https://test.stytch.com/v1/oauth/authenticate"
 STYTCH_SESSION_AUTH_URL = "https://test.stytch.com/v1/sessions/authenticate"
 STYTCH_JWKS_URL = f"https://test.stytch.com/v1/sessions/jwks/{STYTCH_PROJECT_ID}"
 
+# Shared HTTP client - keeps connections to Stytch alive across requests
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+)
+
+# Shared JWKS client - caches the key set and signing keys across verifications
+_JWKS = PyJWKClient(STYTCH_JWKS_URL, cache_keys=True, lifespan=3600, max_cached_keys=32)
+
+# Raw JWT header segment -> 'kid', so repeated headers skip base64 + JSON parsing
+HEADER_KID_CACHE_MAX_SIZE = 64
+_HEADER_KID_CACHE: Dict[str, str] = {}
+
+
+def _get_token_kid(token: str) -> Optional[str]:
+    """Return the 'kid' from a JWT header, caching by the raw header segment."""
+    header_b64 = token.partition(".")[0]
+    kid = _HEADER_KID_CACHE.get(header_b64)
+    if kid is None:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid:
+            if len(_HEADER_KID_CACHE) >= HEADER_KID_CACHE_MAX_SIZE:
+                _HEADER_KID_CACHE.clear()
+            _HEADER_KID_CACHE[header_b64] = kid
+    return kid
+
 
 async def verify_jwt_token(token: str) -> Dict[str, Any]:
     """
     Verify JWT access token from Stytch Connected Apps OAuth flow.
 
     This is used when ChatGPT sends a JWT access token in the Authorization header.
+    JWKS fetching and signature checks are blocking, so they run in a threadpool.
 
     Args:
         token: JWT access token from OAuth flow
@@ -40,6 +69,11 @@ async def verify_jwt_token(token: str) -> Dict[str, Any]:
     Raises:
         Exception: If JWT verification fails
     """
+    return await run_in_threadpool(_verify_jwt_sync, token)
+
+
+def _verify_jwt_sync(token: str) -> Dict[str, Any]:
+    """Synchronous JWT verification (JWKS lookup + jwt.decode)."""
     oauth_logger.info("=" * 80)
     oauth_logger.info("🔐 Starting JWT token verification")
     oauth_logger.info(f"Token (first 20 chars): {token[:20]}...")
@@ -54,12 +88,10 @@ async def verify_jwt_token(token: str) -> Dict[str, Any]:
         oauth_logger.debug(f"Expected issuer: {STYTCH_AUTHORIZATION_SERVER}")
         oauth_logger.debug(f"Expected audience: {STYTCH_PROJECT_ID}")
 
-        # Create JWKS client to fetch signing keys
-        jwks_client = PyJWKClient(STYTCH_JWKS_URL)
-
-        # Get signing key from token header
-        oauth_logger.debug("Fetching signing key from JWKS endpoint")
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        # Look up signing key by 'kid' from the token header (JWKS is cached)
+        kid = _get_token_kid(token)
+        oauth_logger.debug(f"Resolving signing key for kid: {kid}")
+        signing_key = _JWKS.get_signing_key(kid)
 
         # Verify and decode JWT
         oauth_logger.debug("Verifying JWT signature and claims")
@@ -152,15 +184,14 @@ async def verify_stytch_token(token: str) -> Dict[str, Any]:
 
         oauth_logger.debug(f"Using auth method: {'Basic (secret)' if STYTCH_SECRET else 'Bearer (public token)'}")
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                STYTCH_AUTHENTICATE_URL,
-                json={"token": token},
-                headers={
-                    "Authorization": auth_header,
-                    "Content-Type": "application/json"
-                }
-            )
+        response = await _HTTP.post(
+            STYTCH_AUTHENTICATE_URL,
+            json={"token": token},
+            headers={
+                "Authorization": auth_header,
+                "Content-Type": "application/json"
+            }
+        )
 
         oauth_logger.info(f"📡 Stytch response status: {response.status_code}")
         oauth_logger.debug(f"Stytch response headers: {dict(response.headers)}")
@@ -248,15 +279,14 @@ async def verify_stytch_session_token(session_token: str) -> Dict[str, Any]:
         b64_credentials = base64.b64encode(credentials.encode()).decode()
         auth_header = f"Basic {b64_credentials}"
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                STYTCH_SESSION_AUTH_URL,
-                json={"session_token": session_token},
-                headers={
-                    "Authorization": auth_header,
-                    "Content-Type": "application/json"
-                }
-            )
+        response = await _HTTP.post(
+            STYTCH_SESSION_AUTH_URL,
+            json={"session_token": session_token},
+            headers={
+                "Authorization": auth_header,
+                "Content-Type": "application/json"
+            }
+        )
 
         oauth_logger.info(f"📡 Stytch response status: {response.status_code}")
         oauth_logger.debug(f"Stytch response headers: {dict(response.headers)}")
@@ -309,6 +339,11 @@ async def verify_stytch_session_token(session_token: str) -> Dict[str, Any]:
         oauth_logger.info("=" * 80)
 
 
+async def close_http_client() -> None:
+    """Close the shared HTTP client (call on application shutdown)."""
+    await _HTTP.aclose()
+
+
 def extract_twitter_profile(stytch_data: Dict[str, Any]) -> Optional[Dict[str, str]]:
     """
     Extract Twitter profile data from Stytch response.
@@ -379,4 +414,4 @@ def extract_twitter_profile(stytch_data: Dict[str, Any]) -> Optional[Dict[str, s
         return None
 
 
-__all__ = ['verify_stytch_token', 'verify_jwt_token', 'verify_stytch_session_token', 'extract_twitter_profile']
\ No newline at end of file
+__all__ = ['verify_stytch_token', 'verify_jwt_token', 'verify_stytch_session_token', 'extract_twitter_profile', 'close_http_client']
\ No newline at end of file
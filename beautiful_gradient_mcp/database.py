@@ -1,8 +1,9 @@
 """Database models and operations for user profiles."""
 
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 
 from sqlalchemy import create_engine, Column, String, DateTime
 from sqlalchemy.ext.declarative import declarative_base
@@ -15,7 +16,18 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./gradient_mcp.db")
 
 # SQLAlchemy setup
 Base = declarative_base()
-engine = create_engine(DATABASE_URL, echo=False)
+_engine_options = {
+    "echo": False,
+    "pool_pre_ping": True,   # Drop dead connections before handing them out
+    "pool_recycle": 1800,    # Recycle connections every 30 minutes
+}
+if DATABASE_URL.startswith("sqlite"):
+    # Sessions are used from threadpool workers
+    _engine_options["connect_args"] = {"check_same_thread": False}
+else:
+    _engine_options.update(pool_size=20, max_overflow=10)
+
+engine = create_engine(DATABASE_URL, **_engine_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -59,6 +71,19 @@ def get_db() -> Session:
         raise
 
 
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Provide a database session that is rolled back on error and always closed."""
+    db = get_db()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def get_or_create_profile(db: Session, twitter_profile: dict) -> Optional[Profile]:
     """
     Get existing profile or create new one from Twitter data.
@@ -142,4 +167,4 @@ def get_profile_by_user_id(db: Session, stytch_user_id: str) -> Optional[Profile
         return None
 
 
-__all__ = ['Profile', 'init_db', 'get_db', 'get_or_create_profile', 'get_profile_by_user_id']
\ No newline at end of file
+__all__ = ['Profile', 'init_db', 'get_db', 'session_scope', 'get_or_create_profile', 'get_profile_by_user_id']
\ No newline at end of file
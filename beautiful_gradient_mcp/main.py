@@ -1,11 +1,18 @@
 """Beautiful Gradient MCP Server - FastMCP with Stytch OAuth."""
 
 import os
-import json
-import uuid
+import secrets
+import logging
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
+import orjson
 import mcp.types as types
 from mcp.server.fastmcp import FastMCP
 from mcp.server.auth.settings import AuthSettings
@@ -13,12 +20,14 @@ from mcp.server.auth.provider import TokenVerifier, AccessToken
 from mcp.server.auth.middleware.auth_context import get_access_token
 from dotenv import load_dotenv
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, JSONResponse, HTMLResponse, FileResponse
+from starlette.staticfiles import StaticFiles
 
 from logger import oauth_logger, mcp_logger, startup_logger, error_logger
-from auth import verify_stytch_token, verify_jwt_token, verify_stytch_session_token, extract_twitter_profile
-from database import init_db, get_db, get_or_create_profile, get_profile_by_user_id, Profile
+from auth import verify_stytch_token, verify_jwt_token, verify_stytch_session_token, extract_twitter_profile, close_http_client
+from database import init_db, session_scope, get_or_create_profile, get_profile_by_user_id, Profile
 from gradients import GRADIENTS, get_gradient_css
 
 # Load environment variables
@@ -39,11 +48,47 @@ DEFAULT_HOST = os.getenv("SERVER_HOST", "localhost")
 
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", f"{DEFAULT_PROTOCOL}://{DEFAULT_HOST}:{DEFAULT_PORT}")
 
+# Browser origins allowed to call this server (comma-separated override via CORS_ALLOW_ORIGINS)
+CORS_ALLOW_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv(
+        "CORS_ALLOW_ORIGINS",
+        f"{MCP_SERVER_URL},https://chatgpt.com,https://claude.ai"
+    ).split(",")
+    if origin.strip()
+]
+
+UTC = timezone.utc
+
+# Separator line used to frame request logs
+LOG_SEPARATOR = "=" * 80
+
+# Static file locations
+BASE_DIR = Path(__file__).resolve().parent
+WIDGET_PATH = BASE_DIR / "widgets" / "gradient_tweet.html"
+FRONTEND_DIR = BASE_DIR / "frontend" / "dist"
+LOGIN_PATH = FRONTEND_DIR / "index.html"
+
 # OAuth endpoints (legacy - kept for reference)
 OAUTH_AUTHORIZE_URL = "https://test.stytch.com/v1/public/oauth/authorize"
 OAUTH_TOKEN_URL = "https://test.stytch.com/v1/public/oauth/token"
 OAUTH_REGISTER_URL = "https://test.stytch.com/v1/public/oauth/register"
 
+# Verified JWT cache: sha256(token) -> (expires_at, claims)
+TOKEN_CACHE_MAX_SIZE = 1024
+TOKEN_CACHE_EXPIRY_MARGIN = 30  # seconds before 'exp' at which cached claims are dropped
+_TOKEN_CACHE: "OrderedDict[bytes, tuple[float, Dict[str, Any]]]" = OrderedDict()
+_TOKEN_CACHE_LOCK = asyncio.Lock()
+# In-flight verifications: sha256(token) -> task shared by concurrent callers
+_INFLIGHT_VERIFICATIONS: Dict[bytes, "asyncio.Task[Dict[str, Any]]"] = {}
+
+# Profile cache for the widget: user_id -> (expires_at, twitter_data)
+PROFILE_CACHE_TTL = 60  # seconds
+PROFILE_CACHE_MAX_SIZE = 4096
+_PROFILE_CACHE: "OrderedDict[str, tuple[float, Dict[str, str]]]" = OrderedDict()
+# Bumped on every profile save so reads that overlap a save don't re-cache stale data
+_PROFILE_SAVE_COUNT = 0
+
 
 # Custom AccessToken with additional JWT fields
 class StytchAccessToken(AccessToken):
@@ -67,10 +112,13 @@ class StytchVerifier(TokenVerifier):
             StytchAccessToken if valid, None if invalid
         """
         try:
-            oauth_logger.info(f"🔐 Verifying JWT token with Stytch (FastMCP pattern)")
+            cache_key = hashlib.sha256(token.encode()).digest()
+            jwt_claims = await self._get_cached_claims(cache_key)
 
-            # Use JWT verification for OAuth access tokens
-            jwt_claims = await verify_jwt_token(token)
+            if jwt_claims is None:
+                jwt_claims = await self._verify_uncached(cache_key, token)
+            else:
+                oauth_logger.debug("♻️ Using cached JWT claims")
 
             # Extract required fields from JWT claims
             subject = jwt_claims.get("sub")  # User ID is in 'sub' claim
@@ -80,7 +128,7 @@ class StytchVerifier(TokenVerifier):
                 oauth_logger.error("❌ No 'sub' claim in JWT")
                 return None
 
-            oauth_logger.info(f"✅ JWT verified for subject: {subject}")
+            oauth_logger.info("✅ JWT verified for subject: %s", subject)
 
             # Extract scopes if present
             scopes = jwt_claims.get("scope", "").split() if "scope" in jwt_claims else []
@@ -94,10 +142,71 @@ class StytchVerifier(TokenVerifier):
             )
 
         except Exception as e:
-            oauth_logger.error(f"❌ JWT verification failed: {str(e)}")
+            oauth_logger.error("❌ JWT verification failed: %s", e)
             error_logger.exception("JWT verification error", exc_info=e)
             return None
 
+    @classmethod
+    async def _verify_uncached(cls, cache_key: bytes, token: str) -> Dict[str, Any]:
+        """Verify a token, sharing a single verification task between concurrent callers."""
+        task = _INFLIGHT_VERIFICATIONS.get(cache_key)
+        if task is None:
+            # Run as its own task so a cancelled caller doesn't cancel the shared work
+            task = asyncio.ensure_future(cls._verify_and_cache(cache_key, token))
+            _INFLIGHT_VERIFICATIONS[cache_key] = task
+            task.add_done_callback(lambda done: cls._finish_inflight(cache_key, done))
+        else:
+            oauth_logger.debug("⏳ Waiting for in-flight JWT verification")
+
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _verify_and_cache(cls, cache_key: bytes, token: str) -> Dict[str, Any]:
+        """Verify a JWT with Stytch and cache its claims."""
+        oauth_logger.info("🔐 Verifying JWT token with Stytch (FastMCP pattern)")
+
+        # Use JWT verification for OAuth access tokens
+        jwt_claims = await verify_jwt_token(token)
+        await cls._cache_claims(cache_key, jwt_claims)
+        return jwt_claims
+
+    @staticmethod
+    def _finish_inflight(cache_key: bytes, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        """Drop a finished verification from the in-flight map."""
+        if _INFLIGHT_VERIFICATIONS.get(cache_key) is task:
+            del _INFLIGHT_VERIFICATIONS[cache_key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved so a task nobody awaited doesn't log a warning
+
+    @staticmethod
+    async def _get_cached_claims(cache_key: bytes) -> Optional[Dict[str, Any]]:
+        """Return cached JWT claims for a token hash, or None if missing/expired."""
+        async with _TOKEN_CACHE_LOCK:
+            entry = _TOKEN_CACHE.get(cache_key)
+            if entry is None:
+                return None
+
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del _TOKEN_CACHE[cache_key]
+                return None
+
+            _TOKEN_CACHE.move_to_end(cache_key)
+            return claims
+
+    @staticmethod
+    async def _cache_claims(cache_key: bytes, claims: Dict[str, Any]) -> None:
+        """Store verified JWT claims until shortly before the token expires."""
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+
+        async with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[cache_key] = (exp - TOKEN_CACHE_EXPIRY_MARGIN, claims)
+            _TOKEN_CACHE.move_to_end(cache_key)
+            while len(_TOKEN_CACHE) > TOKEN_CACHE_MAX_SIZE:
+                _TOKEN_CACHE.popitem(last=False)
+
 
 # Create FastMCP server with Authentication (Official Pattern)
 mcp_server = FastMCP(
@@ -115,9 +224,18 @@ mcp_server = FastMCP(
 try:
     init_db()
 except Exception as e:
-    startup_logger.error(f"Failed to initialize database: {str(e)}")
+    startup_logger.error("Failed to initialize database: %s", e)
     # Continue anyway for testing
 
+# Widget HTML (static asset, read once at import)
+WIDGET_HTML_FALLBACK = "<p>Widget HTML not available</p>"
+try:
+    WIDGET_HTML = WIDGET_PATH.read_text(encoding='utf-8')
+except OSError as e:
+    startup_logger.warning("Could not read widget HTML: %s", e)
+    WIDGET_HTML = WIDGET_HTML_FALLBACK
+WIDGET_ETAG = f'"{hashlib.md5(WIDGET_HTML.encode()).hexdigest()}"'
+
 # Tool input schema
 TOOL_INPUT_SCHEMA = {
     "type": "object",
@@ -138,69 +256,92 @@ TOOL_INPUT_SCHEMA = {
     "additionalProperties": False
 }
 
+# Static _meta for the create-gradient-tweet tool and its results
+TWEET_TOOL_META = {
+    "openai/widgetAccessible": True,
+    "openai/resultCanProduceWidget": True
+}
+TWEET_RESULT_META = {
+    **TWEET_TOOL_META,
+    # Add metadata to indicate this should render as an inline widget
+    "widget_type": "html",
+    "inline_render": True
+}
+
+
+# Tool definitions are static, so build them once and reuse for every tools/list
+_TOOLS_CACHE: List[types.Tool] = [
+    types.Tool(
+        name="get-my-profile",
+        title="Get My Profile",
+        description="Get the authenticated user's profile information from OAuth",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "additionalProperties": False
+        },
+        securitySchemes=[
+            {
+                "type": "oauth2",
+                "scopes": ["openid", "profile"]
+            }
+        ],
+        annotations={
+            "destructiveHint": False,
+            "openWorldHint": False,
+            "readOnlyHint": True
+        }
+    ),
+    types.Tool(
+        name="create-gradient-tweet",
+        title="Create Gradient Tweet",
+        description="Generate a beautiful tweet mockup with a vibrant gradient background",
+        inputSchema=TOOL_INPUT_SCHEMA,
+        securitySchemes=[
+            {
+                "type": "oauth2",
+                "scopes": ["openid", "profile"]
+            }
+        ],
+        _meta=TWEET_TOOL_META,
+        annotations={
+            "destructiveHint": False,
+            "openWorldHint": False,
+            "readOnlyHint": True
+        }
+    )
+]
+
 
 @mcp_server._mcp_server.list_tools()
 async def _list_tools() -> List[types.Tool]:
     """List available MCP tools."""
     mcp_logger.info("📋 Tools list requested")
+    mcp_logger.info("✅ Returned %s tools", len(_TOOLS_CACHE))
+    return _TOOLS_CACHE
 
-    tools = [
-        types.Tool(
-            name="get-my-profile",
-            title="Get My Profile",
-            description="Get the authenticated user's profile information from OAuth",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "additionalProperties": False
-            },
-            securitySchemes=[
-                {
-                    "type": "oauth2",
-                    "scopes": ["openid", "profile"]
-                }
-            ],
-            annotations={
-                "destructiveHint": False,
-                "openWorldHint": False,
-                "readOnlyHint": True
-            }
-        ),
-        types.Tool(
-            name="create-gradient-tweet",
-            title="Create Gradient Tweet",
-            description="Generate a beautiful tweet mockup with a vibrant gradient background",
-            inputSchema=TOOL_INPUT_SCHEMA,
-            securitySchemes=[
-                {
-                    "type": "oauth2",
-                    "scopes": ["openid", "profile"]
-                }
-            ],
-            _meta={
-                "openai/widgetAccessible": True,
-                "openai/resultCanProduceWidget": True
-            },
-            annotations={
-                "destructiveHint": False,
-                "openWorldHint": False,
-                "readOnlyHint": True
-            }
-        )
-    ]
 
-    mcp_logger.info(f"✅ Returned {len(tools)} tools")
-    return tools
+def _dump_for_log(value: Any) -> str:
+    """Pretty-print a value for logs; never raises (orjson rejects e.g. >64-bit ints)."""
+    try:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+    except orjson.JSONEncodeError:
+        return repr(value)
 
 
 async def _call_tool(request: types.CallToolRequest) -> types.ServerResult:
     """Handle MCP tool calls."""
-    request_id = uuid.uuid4().hex[:8]
-
-    mcp_logger.info("=" * 80)
-    mcp_logger.info(f"📥 MCP Tool Call [{request_id}]")
-    mcp_logger.info(f"Tool: {request.params.name}")
-    mcp_logger.info(f"Arguments: {json.dumps(request.params.arguments, indent=2)}")
+    request_id = secrets.token_hex(4)
+
+    # Single record for the call header (one handler lock/write instead of four)
+    if mcp_logger.isEnabledFor(logging.INFO):
+        mcp_logger.info(
+            "%s\n📥 MCP Tool Call [%s]\nTool: %s\nArguments: %s",
+            LOG_SEPARATOR,
+            request_id,
+            request.params.name,
+            _dump_for_log(request.params.arguments)
+        )
 
     # FastMCP's dependency injection will provide the verified AccessToken
     # via get_access_token() inside the tool handlers
@@ -211,7 +352,7 @@ async def _call_tool(request: types.CallToolRequest) -> types.ServerResult:
     elif request.params.name == "create-gradient-tweet":
         return await handle_create_gradient_tweet(request.params.arguments, request_id)
     else:
-        mcp_logger.error(f"❌ Unknown tool: {request.params.name}")
+        mcp_logger.error("❌ Unknown tool: %s", request.params.name)
         return types.ServerResult(
             types.CallToolResult(
                 content=[
@@ -229,14 +370,14 @@ async def handle_get_my_profile(
     request_id: str
 ) -> types.ServerResult:
     """Handle the get-my-profile tool to test OAuth authentication."""
-    mcp_logger.info(f"🔧 Executing get-my-profile [{request_id}]")
+    mcp_logger.info("🔧 Executing get-my-profile [%s]", request_id)
 
     try:
         # Get the verified access token from FastMCP's dependency injection
         access_token = get_access_token()
 
         if not access_token:
-            mcp_logger.error(f"❌ No access token available [{request_id}]")
+            mcp_logger.error("❌ No access token available [%s]", request_id)
             return types.ServerResult(
                 types.CallToolResult(
                     content=[
@@ -263,8 +404,8 @@ async def handle_get_my_profile(
             "jwt_claims": jwt_claims
         }
 
-        mcp_logger.info(f"✅ Profile retrieved for user: {subject} [{request_id}]")
-        mcp_logger.info(f"📊 Scopes: {scopes}")
+        mcp_logger.info("✅ Profile retrieved for user: %s [%s]", subject, request_id)
+        mcp_logger.info("📊 Scopes: %s", scopes)
 
         # Create readable text response
         text_response = f"""Profile Information:
@@ -286,7 +427,7 @@ async def handle_get_my_profile(
         )
 
     except Exception as e:
-        mcp_logger.error(f"❌ Failed to get profile: {str(e)} [{request_id}]")
+        mcp_logger.error("❌ Failed to get profile: %s [%s]", e, request_id)
         error_logger.exception("Get profile error", exc_info=e)
         return types.ServerResult(
             types.CallToolResult(
@@ -301,12 +442,60 @@ async def handle_get_my_profile(
         )
 
 
+def _get_cached_profile(user_id: str) -> Optional[Dict[str, str]]:
+    """Return cached widget profile data for a user, or None if missing/expired."""
+    entry = _PROFILE_CACHE.get(user_id)
+    if entry is None:
+        return None
+
+    expires_at, twitter_data = entry
+    if expires_at <= time.time():
+        del _PROFILE_CACHE[user_id]
+        return None
+
+    _PROFILE_CACHE.move_to_end(user_id)
+    return twitter_data
+
+
+def _cache_profile(user_id: str, twitter_data: Dict[str, str], save_count: int) -> None:
+    """Cache widget profile data for a user, evicting the least recently used entries.
+
+    Skipped if any profile was saved since ``save_count`` was read, as the data may be stale.
+    """
+    if _PROFILE_SAVE_COUNT != save_count:
+        return
+
+    _PROFILE_CACHE[user_id] = (time.time() + PROFILE_CACHE_TTL, twitter_data)
+    _PROFILE_CACHE.move_to_end(user_id)
+    while len(_PROFILE_CACHE) > PROFILE_CACHE_MAX_SIZE:
+        _PROFILE_CACHE.popitem(last=False)
+
+
+def _invalidate_profile(user_id: str) -> None:
+    """Drop a user's cached profile and bump the save counter."""
+    global _PROFILE_SAVE_COUNT
+    _PROFILE_SAVE_COUNT += 1
+    _PROFILE_CACHE.pop(user_id, None)
+
+
+def _load_profile(user_id: str) -> Optional[Profile]:
+    """Load a user's profile in its own session (blocking, run in a threadpool)."""
+    with session_scope() as db:
+        return get_profile_by_user_id(db, user_id)
+
+
+def _save_profile(twitter_profile: Dict[str, Any]) -> Optional[Profile]:
+    """Create or update a user's profile in its own session (blocking, run in a threadpool)."""
+    with session_scope() as db:
+        return get_or_create_profile(db, twitter_profile)
+
+
 async def handle_create_gradient_tweet(
     arguments: Dict[str, Any],
     request_id: str
 ) -> types.ServerResult:
     """Handle the create-gradient-tweet tool."""
-    mcp_logger.info(f"🔧 Executing create-gradient-tweet [{request_id}]")
+    mcp_logger.info("🔧 Executing create-gradient-tweet [%s]", request_id)
 
     tweet_content = arguments.get("tweetContent", "")
     gradient_index = arguments.get("gradientIndex", 0)
@@ -316,39 +505,42 @@ async def handle_create_gradient_tweet(
         gradient_index = 0
 
     gradient = GRADIENTS[gradient_index]
-    mcp_logger.info(f"🌈 Using gradient: {gradient['name']} (index {gradient_index})")
+    mcp_logger.info("🌈 Using gradient: %s (index %s)", gradient['name'], gradient_index)
 
-    # Try to get authenticated user profile from database
-    profile = None
+    # Try to get authenticated user profile (cache first, then database)
+    twitter_data = None
     try:
         access_token = get_access_token()
 
         if access_token and access_token.subject:
             # We have an authenticated user
             user_id = access_token.subject
-            mcp_logger.info(f"✅ Authenticated user: {user_id}")
+            mcp_logger.info("✅ Authenticated user: %s", user_id)
+
+            twitter_data = _get_cached_profile(user_id)
 
-            # Look up profile from database (saved during frontend OAuth flow)
-            db = get_db()
-            try:
-                profile = get_profile_by_user_id(db, user_id)
+            if twitter_data:
+                mcp_logger.info("♻️ Profile loaded from cache: @%s", twitter_data['handle'])
+            else:
+                # Look up profile from database (saved during frontend OAuth flow)
+                save_count = _PROFILE_SAVE_COUNT
+                profile = await run_in_threadpool(_load_profile, user_id)
 
                 if profile:
-                    mcp_logger.info(f"✅ Profile loaded from database: @{profile.twitter_handle}")
+                    mcp_logger.info("✅ Profile loaded from database: @%s", profile.twitter_handle)
+                    # Use real Twitter profile
+                    twitter_data = {
+                        "handle": profile.twitter_handle or "twitter_user",
+                        "name": profile.display_name or "Twitter User",
+                        "avatar": profile.avatar_url or "https://abs.twimg.com/sticky/default_profile_images/default_profile_400x400.png"
+                    }
+                    _cache_profile(user_id, twitter_data, save_count)
                 else:
-                    mcp_logger.warning(f"⚠️ Profile not found in database for user: {user_id}")
+                    mcp_logger.warning("⚠️ Profile not found in database for user: %s", user_id)
                     mcp_logger.warning("⚠️ User may need to re-login via frontend to save profile")
-            finally:
-                db.close()
 
-        if profile:
-            # Use real Twitter profile
-            twitter_data = {
-                "handle": profile.twitter_handle or "twitter_user",
-                "name": profile.display_name or "Twitter User",
-                "avatar": profile.avatar_url or "https://abs.twimg.com/sticky/default_profile_images/default_profile_400x400.png"
-            }
-            mcp_logger.info(f"🐦 Using authenticated profile: @{twitter_data['handle']}")
+        if twitter_data:
+            mcp_logger.info("🐦 Using authenticated profile: @%s", twitter_data['handle'])
         else:
             # No profile - use default
             twitter_data = {
@@ -360,7 +552,7 @@ async def handle_create_gradient_tweet(
 
     except Exception as e:
         # If anything goes wrong, fall back to default
-        mcp_logger.warning(f"⚠️ Could not get user profile: {str(e)}, using default profile")
+        mcp_logger.warning("⚠️ Could not get user profile: %s, using default profile", e)
         error_logger.exception("Profile lookup error", exc_info=e)
         twitter_data = {
             "handle": "twitter_user",
@@ -374,81 +566,34 @@ async def handle_create_gradient_tweet(
         "gradientIndex": gradient_index,
         "gradientName": gradient['name'],
         "profile": twitter_data,
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": datetime.now(UTC).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
         "widgetUrl": f"{MCP_SERVER_URL}/widget/gradient-tweet"
     }
 
     # Text response
     text_response = f"Created gradient tweet with {gradient['name']} gradient!"
 
-    # Read widget HTML content
-    widget_html = ""
-    try:
-        widget_path = os.path.join(os.path.dirname(__file__), "widgets", "gradient_tweet.html")
-        with open(widget_path, 'r', encoding='utf-8') as f:
-            widget_html = f.read()
-    except Exception as e:
-        mcp_logger.warning(f"Could not read widget HTML: {e}")
-        widget_html = "<p>Widget HTML not available</p>"
-
-    mcp_logger.info(f"✅ Tool executed successfully [{request_id}]")
-    mcp_logger.debug(f"Structured content: {json.dumps(structured_content, indent=2)}")
-    mcp_logger.info("=" * 80)
-
-    # Return content that will display the HTML widget inline
-    # This approach should work for MCP inline HTML rendering
-    content_items = [
-        types.TextContent(
-            type="text",
-            text=text_response
-        )
-    ]
-    
-    # Try to include the HTML widget for inline display
-    # The MCP system should render HTML content inline when properly formatted
-    if widget_html and widget_html != "<p>Widget HTML not available</p>":
-        try:
-            # Attempt to add HTML content that the MCP client can render inline
-            # Based on MCP specifications, this should work for widget rendering
-            content_items.append(
-                types.TextContent(
-                    type="text",
-                    text=widget_html
-                )
-            )
-        except Exception as e:
-            mcp_logger.warning(f"Failed to add HTML content: {e}")
+    # Widget HTML content (loaded at import), omitted when unavailable
+    widget_html = WIDGET_HTML if WIDGET_HTML and WIDGET_HTML != WIDGET_HTML_FALLBACK else None
+
+    if mcp_logger.isEnabledFor(logging.DEBUG):
+        mcp_logger.debug("Structured content: %s", _dump_for_log(structured_content))
+    mcp_logger.info("✅ Tool executed successfully [%s]\n%s", request_id, LOG_SEPARATOR)
+
+    # Text response, followed by the HTML widget for inline display when available
+    content = [types.TextContent(type="text", text=text_response)]
+    if widget_html:
+        content.append(types.TextContent(type="text", text=widget_html))
+
+    # Include widget HTML in structured content for MCP widget handling
+    structured_content["widget_html"] = widget_html
 
-    # For inline HTML widget display, we need to return the content in a specific way
-    # The MCP system should render HTML widgets inline when properly formatted
-    
     # Create the response with HTML content for inline rendering
-    # The key is to include the HTML in a way that triggers inline widget rendering
     return types.ServerResult(
         types.CallToolResult(
-            content=[
-                types.TextContent(
-                    type="text",
-                    text=text_response
-                )
-            ] + ([
-                types.TextContent(
-                    type="text",
-                    text=widget_html
-                )
-            ] if widget_html and widget_html != "<p>Widget HTML not available</p>" else []),
-            structuredContent={
-                **structured_content,
-                # Include widget HTML in structured content for MCP widget handling
-                "widget_html": widget_html if widget_html and widget_html != "<p>Widget HTML not available</p>" else None
-            },
-            _meta={
-                "openai/widgetAccessible": True,
-                "openai/resultCanProduceWidget": True,
-                # Add metadata to indicate this should render as an inline widget
-                "widget_type": "html",
-                "inline_render": True
-            }
+            content=content,
+            structuredContent=structured_content,
+            _meta=TWEET_RESULT_META
         )
     )
 
@@ -462,70 +607,97 @@ async def handle_create_gradient_tweet(
 mcp_server._mcp_server.request_handlers[types.CallToolRequest] = _call_tool
 
 # Create Starlette app from FastMCP
-from starlette.routing import Route, Mount
-from starlette.responses import HTMLResponse, FileResponse
-from starlette.staticfiles import StaticFiles
-import os
-
 app = mcp_server.streamable_http_app()
 
+# Wrap FastMCP's lifespan so shared clients are closed on shutdown
+_mcp_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    async with _mcp_lifespan(app) as state:
+        try:
+            yield state
+        finally:
+            await close_http_client()
+
+
+app.router.lifespan_context = _lifespan
+
 # OAuth Protected Resource Metadata route is automatically added by FastMCP
 # when auth=AuthSettings(...) is configured
 
 # Serve built React app
-FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend", "dist")
+
+# Login page HTML (read once; None if the frontend hasn't been built yet)
+try:
+    LOGIN_HTML = LOGIN_PATH.read_text(encoding='utf-8')
+    LOGIN_ETAG = f'"{hashlib.md5(LOGIN_HTML.encode()).hexdigest()}"'
+except OSError:
+    LOGIN_HTML = None
+    LOGIN_ETAG = None
 
 # Mount static assets
-app.mount("/assets", StaticFiles(directory=os.path.join(FRONTEND_DIR, "assets")), name="assets")
+app.mount("/assets", StaticFiles(directory=FRONTEND_DIR / "assets"), name="assets")
 
 # API endpoint to save user profile after frontend OAuth
 @app.route("/api/save-profile", methods=["POST"])
 async def save_profile(request):
     """Save user profile after successful OAuth authentication."""
-    import json
-    from starlette.responses import JSONResponse
+    request_id = secrets.token_hex(4)
+    mcp_logger.info("%s\n📥 Profile save request [%s]", LOG_SEPARATOR, request_id)
 
-    request_id = uuid.uuid4().hex[:8]
-    mcp_logger.info("=" * 80)
-    mcp_logger.info(f"📥 Profile save request [{request_id}]")
+    # Parse request body (ValueError covers both JSONDecodeError and UnicodeDecodeError)
+    try:
+        data = await request.json()
+        if not isinstance(data, dict):
+            raise ValueError("request body must be a JSON object")
+    except ValueError as e:
+        mcp_logger.error("❌ Invalid JSON body: %s [%s]", e, request_id)
+        return JSONResponse(
+            {"success": False, "message": "Invalid JSON body"},
+            status_code=400
+        )
 
     try:
-        # Parse request body
-        body = await request.body()
-        data = json.loads(body)
         session_token = data.get("session_token")
 
         if not session_token:
-            mcp_logger.error(f"❌ No session_token provided [{request_id}]")
+            mcp_logger.error("❌ No session_token provided [%s]", request_id)
             return JSONResponse(
                 {"success": False, "message": "session_token required"},
                 status_code=400
             )
 
-        mcp_logger.info(f"🔐 Verifying session token [{request_id}]")
+        mcp_logger.info("🔐 Verifying session token [%s]", request_id)
 
         # Call Stytch to get full user data including Twitter profile
         user_data = await verify_stytch_session_token(session_token)
-        mcp_logger.info(f"✅ Token verified [{request_id}]")
+        mcp_logger.info("✅ Token verified [%s]", request_id)
 
         # Extract Twitter profile
-        mcp_logger.info(f"🐦 Extracting Twitter profile [{request_id}]")
+        mcp_logger.info("🐦 Extracting Twitter profile [%s]", request_id)
         twitter_profile = extract_twitter_profile(user_data)
 
         if not twitter_profile:
-            mcp_logger.warning(f"⚠️ No Twitter profile found in response [{request_id}]")
+            mcp_logger.warning("⚠️ No Twitter profile found in response [%s]", request_id)
             return JSONResponse(
                 {"success": False, "message": "No Twitter profile found"},
                 status_code=400
             )
 
-        # Save to database
-        db = get_db()
+        # Save to database, invalidating the cached profile before and after the write
+        # so tool calls whose reads overlap the save can't re-cache stale data
+        stytch_user_id = twitter_profile.get('stytch_user_id')
+        if stytch_user_id:
+            _invalidate_profile(stytch_user_id)
         try:
-            profile = get_or_create_profile(db, twitter_profile)
+            profile = await run_in_threadpool(_save_profile, twitter_profile)
+            if stytch_user_id:
+                _invalidate_profile(stytch_user_id)
 
             if profile:
-                mcp_logger.info(f"✅ Profile save endpoint succeeded [@{profile.twitter_handle}] [{request_id}]")
+                mcp_logger.info("✅ Profile save endpoint succeeded [@%s] [%s]", profile.twitter_handle, request_id)
                 return JSONResponse({
                     "success": True,
                     "message": "Profile saved successfully",
@@ -535,51 +707,56 @@ async def save_profile(request):
                     }
                 })
             else:
-                mcp_logger.error(f"❌ Failed to save profile to database [{request_id}]")
+                mcp_logger.error("❌ Failed to save profile to database [%s]", request_id)
                 return JSONResponse(
                     {"success": False, "message": "Failed to save profile"},
                     status_code=500
                 )
         finally:
-            db.close()
-            mcp_logger.info("=" * 80)
+            mcp_logger.info(LOG_SEPARATOR)
 
     except Exception as e:
-        mcp_logger.error(f"❌ Profile save endpoint failed: {str(e)} [{request_id}]")
+        mcp_logger.error("❌ Profile save endpoint failed: %s [%s]", e, request_id)
         error_logger.exception("Profile save error", exc_info=e)
-        mcp_logger.info("=" * 80)
+        mcp_logger.info(LOG_SEPARATOR)
         return JSONResponse(
             {"success": False, "message": f"Error: {str(e)}"},
             status_code=500
         )
 
 
+def _cached_response(request, content, media_type: str, etag: str, cache_control: str) -> Response:
+    """Serve an in-memory body with an ETag, answering 304 when the client copy is current."""
+    headers = {"Cache-Control": cache_control, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Comma-separated list of (possibly weak, W/"...") tags, or "*" (as in StaticFiles.is_not_modified)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content, media_type=media_type, headers=headers)
+
+
+# Gradients payload is static, so serialize it once at import
+GRADIENTS_BODY = orjson.dumps({
+    "success": True,
+    "gradients": GRADIENTS,
+    "count": len(GRADIENTS)
+})
+GRADIENTS_ETAG = f'"{hashlib.md5(GRADIENTS_BODY).hexdigest()}"'
+
+
 # API endpoint to get all 25 gradients for the widget
 @app.route("/api/gradients", methods=["GET"])
 async def get_all_gradients_api(request):
     """Get all 25 gradients for the widget."""
-    from starlette.responses import JSONResponse
-    
-    try:
-        return JSONResponse({
-            "success": True,
-            "gradients": GRADIENTS,
-            "count": len(GRADIENTS)
-        })
-    except Exception as e:
-        mcp_logger.error(f"❌ Failed to get gradients: {str(e)}")
-        return JSONResponse(
-            {"success": False, "message": f"Error: {str(e)}"},
-            status_code=500
-        )
+    return _cached_response(request, GRADIENTS_BODY, "application/json", GRADIENTS_ETAG, "public, max-age=300")
 
 
 # API endpoint to handle image uploads for sharing
 @app.route("/api/upload-image", methods=["POST"])
 async def upload_image(request):
     """Handle image uploads for sharing functionality."""
-    from starlette.responses import JSONResponse
-    
     try:
         # For now, return a mock URL since we don't have actual image hosting
         # In a real implementation, you'd upload to a service like Cloudinary, AWS S3, etc.
@@ -589,7 +766,7 @@ async def upload_image(request):
             "message": "Image upload not implemented yet"
         })
     except Exception as e:
-        mcp_logger.error(f"❌ Failed to upload image: {str(e)}")
+        mcp_logger.error("❌ Failed to upload image: %s", e)
         return JSONResponse(
             {"success": False, "message": f"Error: {str(e)}"},
             status_code=500
@@ -600,41 +777,45 @@ async def upload_image(request):
 @app.route("/widget/gradient-tweet")
 async def serve_gradient_widget(request):
     """Serve the gradient tweet widget HTML."""
-    try:
-        widget_path = os.path.join(os.path.dirname(__file__), "widgets", "gradient_tweet.html")
-        return FileResponse(widget_path)
-    except Exception as e:
-        mcp_logger.error(f"❌ Failed to serve widget: {str(e)}")
+    if WIDGET_HTML == WIDGET_HTML_FALLBACK:
+        mcp_logger.error("❌ Failed to serve widget: widget HTML not loaded")
         return HTMLResponse("<p>Widget not available</p>", status_code=404)
 
+    return _cached_response(request, WIDGET_HTML, "text/html", WIDGET_ETAG, "public, max-age=3600, immutable")
+
 
 # Serve index.html at /login
 @app.route("/login")
 async def login_page(request):
     """Serve the OAuth login page (built React app with Stytch IdentityProvider)."""
-    return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
+    if LOGIN_HTML is None:
+        return FileResponse(LOGIN_PATH)
+
+    # Revalidate on every visit so a new frontend build is picked up after restart
+    return _cached_response(request, LOGIN_HTML, "text/html", LOGIN_ETAG, "no-cache")
 
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ALLOW_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
-    allow_credentials=False
+    allow_credentials=False,
+    max_age=86400  # Let browsers cache preflight responses for 24h
 )
 
 
 # Startup logging (called when server starts)
 def log_startup():
     """Server startup logging."""
-    startup_logger.info("=" * 80)
+    startup_logger.info(LOG_SEPARATOR)
     startup_logger.info("🚀 Beautiful Gradient MCP Server Starting")
-    startup_logger.info("=" * 80)
-    startup_logger.info(f"Stytch Project ID: {STYTCH_PROJECT_ID[:20] if STYTCH_PROJECT_ID else 'NOT SET'}...")
-    startup_logger.info(f"Stytch Authorization Server: {STYTCH_AUTHORIZATION_SERVER}")
-    startup_logger.info(f"OAuth Metadata Endpoint: /.well-known/oauth-protected-resource")
-    startup_logger.info("=" * 80)
+    startup_logger.info(LOG_SEPARATOR)
+    startup_logger.info("Stytch Project ID: %s...", STYTCH_PROJECT_ID[:20] if STYTCH_PROJECT_ID else 'NOT SET')
+    startup_logger.info("Stytch Authorization Server: %s", STYTCH_AUTHORIZATION_SERVER)
+    startup_logger.info("OAuth Metadata Endpoint: /.well-known/oauth-protected-resource")
+    startup_logger.info(LOG_SEPARATOR)
 
 
 if __name__ == "__main__":
@@ -652,7 +833,7 @@ if __name__ == "__main__":
     use_ssl = USE_HTTPS or (SSL_CERT_PATH and SSL_KEY_PATH and os.path.exists(SSL_CERT_PATH) and os.path.exists(SSL_KEY_PATH))
     
     if use_ssl and SSL_CERT_PATH and SSL_KEY_PATH:
-        startup_logger.info(f"🔒 Starting with HTTPS using certificates: {SSL_CERT_PATH}")
+        startup_logger.info("🔒 Starting with HTTPS using certificates: %s", SSL_CERT_PATH)
         uvicorn.run(
             "main:app", 
             host="0.0.0.0", 
@@ -662,6 +843,6 @@ if __name__ == "__main__":
             ssl_certfile=SSL_CERT_PATH
         )
     else:
-        startup_logger.info(f"🌐 Starting with HTTP on port {SERVER_PORT}")
+        startup_logger.info("🌐 Starting with HTTP on port %s", SERVER_PORT)
         startup_logger.info("💡 For HTTPS, set USE_HTTPS=true and provide SSL_CERT_PATH and SSL_KEY_PATH")
         uvicorn.run("main:app", host="0.0.0.0", port=SERVER_PORT, reload=True)
\ No newline at end of file